@@ -1,20 +1,26 @@
 from __future__ import annotations
 
+import copy
 import io
 import json
+import os
 import re
+import tempfile
 import unicodedata
 import warnings
 from calendar import month_name
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import Any, BinaryIO, Callable
 
+import numpy as np
+import orjson
 import pandas as pd
 from fastapi import FastAPI, File, Form, HTTPException, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 
-app = FastAPI(title="MRW Commissions API")
+app = FastAPI(title="MRW Commissions API", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,6 +31,12 @@ app.add_middleware(
 )
 
 MAPPING_FILE = Path(__file__).with_name("saved_mapping.json")
+# (mtime_ns, size) del fichero y su contenido parseado, para no releerlo en cada request.
+_MAPPING_CACHE: tuple[tuple[int, int], dict[str, Any] | None] | None = None
+# os.umask solo se puede consultar cambiandola: la leemos una vez al importar, antes de
+# que haya hilos, para dar al mapping guardado los mismos permisos que un open() normal.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
 
 MONTHS_ES = [
     "enero",
@@ -57,37 +69,61 @@ MONTH_ALIAS = {
     "dic": "diciembre",
 }
 
+MONTH_LOOKUP = {month: month for month in MONTHS_ES} | MONTH_ALIAS
+MONTH_INDEX = {month: idx for idx, month in enumerate(MONTHS_ES, start=1)}
+MONTH_BY_NUMBER = {str(idx): month for month, idx in MONTH_INDEX.items()}
+# Python no fija locale al arrancar, asi que month_name siempre viene en ingles (ASCII).
+MONTH_BY_ENGLISH_NAME = {month_name[idx].lower(): month for month, idx in MONTH_INDEX.items()}
+
+WHITESPACE_RE = re.compile(r"\s+")
+YEAR_RE = re.compile(r"\b(19\d{2}|20\d{2}|21\d{2})\b")
+MONTH_NUMBER_RE = re.compile(r"(0?[1-9]|1[0-2])([/-]\d{2,4})?")
+NULL_TEXT_RE = re.compile(r"(?i)^(nan|none|null)$")
+DECIMAL_COMMA_RE = re.compile(r",[^.,]*$")
+MONTH_SEPARATOR_RE = re.compile(r"[ \-/]")
+
+# Tildes habituales ya en minuscula; el resto de caracteres no ASCII pasan por NFD.
+DIACRITICS_MAP = str.maketrans("áéíóúàèìòùâêîôûäëïöüñç", "aeiouaeiouaeiouaeiounc")
+
 
 def normalize_text(value: Any) -> str:
-    text = str(value or "").strip().lower()
-    text = "".join(
-        c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn"
-    )
-    text = re.sub(r"\s+", " ", text)
-    return text
+    # Las celdas pueden no ser hashables; cacheamos sobre su representacion en texto.
+    return _normalize_text_cached(str(value or ""))
+
+
+@lru_cache(maxsize=4096)
+def _normalize_text_cached(text: str) -> str:
+    text = text.strip().lower()
+    if text.isascii():
+        return WHITESPACE_RE.sub(" ", text)
+    text = text.translate(DIACRITICS_MAP)
+    if not text.isascii():
+        text = "".join(
+            c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn"
+        )
+    return WHITESPACE_RE.sub(" ", text)
 
 
 def normalize_month(value: Any) -> str:
-    raw = normalize_text(value)
+    return _normalize_month_cached(str(value or ""))
+
+
+@lru_cache(maxsize=4096)
+def _normalize_month_cached(text: str) -> str:
+    raw = _normalize_text_cached(text)
     if not raw:
         return ""
-    if raw in MONTHS_ES:
-        return raw
-    if raw in MONTH_ALIAS:
-        return MONTH_ALIAS[raw]
-    for idx, name in enumerate(MONTHS_ES, start=1):
-        if raw == str(idx):
-            return name
-    for idx in range(1, 13):
-        if raw == normalize_text(month_name[idx]):
-            return MONTHS_ES[idx - 1]
-    for month in MONTHS_ES:
-        if raw.startswith(f"{month} ") or raw.startswith(f"{month}-") or raw.startswith(f"{month}/"):
-            return month
-    for alias, month in MONTH_ALIAS.items():
-        if raw.startswith(f"{alias} ") or raw.startswith(f"{alias}-") or raw.startswith(f"{alias}/"):
-            return month
-    compact = re.fullmatch(r"(0?[1-9]|1[0-2])([/-]\d{2,4})?", raw)
+    if raw in MONTH_LOOKUP:
+        return MONTH_LOOKUP[raw]
+    if raw in MONTH_BY_NUMBER:
+        return MONTH_BY_NUMBER[raw]
+    if raw in MONTH_BY_ENGLISH_NAME:
+        return MONTH_BY_ENGLISH_NAME[raw]
+    # "enero 2025", "ene-25", "feb/2026": el mes es lo que va antes del primer separador.
+    head = MONTH_SEPARATOR_RE.split(raw, maxsplit=1)[0]
+    if head in MONTH_LOOKUP:
+        return MONTH_LOOKUP[head]
+    compact = MONTH_NUMBER_RE.fullmatch(raw)
     if compact:
         return MONTHS_ES[int(compact.group(1)) - 1]
     return raw
@@ -103,7 +139,7 @@ def extract_year(value: Any) -> int | None:
                 return year
         except Exception:  # noqa: BLE001
             pass
-    match = re.search(r"\b(19\d{2}|20\d{2}|21\d{2})\b", str(value))
+    match = YEAR_RE.search(str(value))
     if match:
         return int(match.group(1))
     return None
@@ -117,16 +153,33 @@ def normalize_month_year(value: Any, fallback_year: int | None = None) -> str:
     return f"{month} {year}" if year else month
 
 
+def map_unique_values(series: pd.Series, func: Callable[[Any], str]) -> pd.Series:
+    # Las columnas de mes repiten pocas etiquetas: aplicamos func una vez por valor distinto.
+    codes, uniques = pd.factorize(series)
+    labels = np.array([func(value) for value in uniques] + [func(None)], dtype=object)
+    return pd.Series(labels[codes], index=series.index)
+
+
 def month_year_sort_key(label: str) -> tuple[int, int, str]:
     normalized = normalize_text(label)
     year = extract_year(normalized) or 0
     month = normalize_month(normalized)
-    month_idx = MONTHS_ES.index(month) + 1 if month in MONTHS_ES else 99
-    return (year, month_idx, normalized)
+    return (year, MONTH_INDEX.get(month, 99), normalized)
+
 
+def normalized_columns(df: pd.DataFrame) -> list[tuple[Any, str]]:
+    # Lista de pares (columna, cabecera normalizada): un dict por cabecera normalizada
+    # perderia columnas como "Enero 2026" / "ENERO 2026".
+    return [(col, normalize_text(col)) for col in df.columns]
 
-def find_column(df: pd.DataFrame, candidates: list[str]) -> str | None:
-    normalized = {normalize_text(col): col for col in df.columns}
+
+def find_column(
+    df: pd.DataFrame,
+    candidates: list[str],
+    norm_columns: list[tuple[Any, str]] | None = None,
+) -> str | None:
+    pairs = norm_columns if norm_columns is not None else normalized_columns(df)
+    normalized = {key: col for col, key in pairs}
     for candidate in candidates:
         if candidate in normalized:
             return normalized[candidate]
@@ -137,47 +190,68 @@ def find_column(df: pd.DataFrame, candidates: list[str]) -> str | None:
     return None
 
 
-def parse_number(value: Any) -> float:
-    if value is None:
-        return 0.0
-    if isinstance(value, (int, float)):
-        return float(value)
-    text = str(value).strip()
-    if not text:
-        return 0.0
-    if normalize_text(text) in {"nan", "none", "null"}:
-        return 0.0
-    text = text.replace("€", "").replace(" ", "")
-    if "," in text and "." in text:
-        if text.rfind(",") > text.rfind("."):
-            text = text.replace(".", "").replace(",", ".")
-        else:
-            text = text.replace(",", "")
-    else:
-        text = text.replace(",", ".")
-    try:
-        return float(text)
-    except ValueError:
-        return 0.0
-
-
-def month_columns(df: pd.DataFrame) -> list[str]:
+def parse_number_series(series: pd.Series) -> pd.Series:
+    numbers = pd.to_numeric(series, errors="coerce")
+    if pd.api.types.is_numeric_dtype(series):
+        return numbers.fillna(0.0).astype("float64")
+    # Las celdas nativas (numeros, booleanos) ya las convierte to_numeric; el parseo de
+    # texto solo se aplica a las cadenas que no entiende ("1.234,56 €").
+    values = numbers.to_numpy(dtype="float64", na_value=np.nan, copy=True)
+    raw = series.to_numpy(dtype=object)
+    pending = np.flatnonzero(np.isnan(values))
+    pending = pending[[isinstance(raw[pos], str) for pos in pending]]
+    if len(pending):
+        values[pending] = parse_number_text(pd.Series(raw[pending], dtype="string")).to_numpy()
+    return pd.Series(values, index=series.index).fillna(0.0)
+
+
+def parse_number_text(text: pd.Series) -> pd.Series:
+    text = text.str.strip().str.replace("€", "", regex=False).str.replace(" ", "", regex=False)
+    has_comma = text.str.contains(",", regex=False, na=False)
+    has_dot = text.str.contains(".", regex=False, na=False)
+    # Con ambos separadores, el ultimo en aparecer es el decimal.
+    comma_decimal = has_comma & has_dot & text.str.contains(DECIMAL_COMMA_RE, regex=True, na=False)
+    thousands_comma = has_comma & has_dot & ~comma_decimal
+    text = text.mask(comma_decimal, text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    text = text.mask(thousands_comma, text.str.replace(",", "", regex=False))
+    text = text.mask(~(has_comma & has_dot), text.str.replace(",", ".", regex=False))
+    return pd.to_numeric(text, errors="coerce").astype("float64")
+
+
+def month_columns(
+    df: pd.DataFrame, norm_columns: list[tuple[Any, str]] | None = None
+) -> list[str]:
+    pairs = norm_columns if norm_columns is not None else normalized_columns(df)
     result: list[str] = []
-    for col in df.columns:
-        if normalize_month(col) in MONTHS_ES:
+    for col, key in pairs:
+        if normalize_month(key) in MONTHS_ES:
             result.append(col)
     return result
 
 
 def clean_text_series(series: pd.Series) -> pd.Series:
-    cleaned = series.fillna("").map(str).str.strip()
-    cleaned = cleaned.replace(to_replace=r"(?i)^(nan|none|null)$", value="", regex=True)
+    # astype("string") sobre fechas da "2025-01-01"; pasando por object conservamos
+    # el mismo texto que str() ("2025-01-01 00:00:00").
+    if pd.api.types.is_datetime64_any_dtype(series) or pd.api.types.is_timedelta64_dtype(series):
+        series = series.astype(object)
+    cleaned = series.astype("string").fillna("").str.strip()
+    cleaned = cleaned.mask(cleaned.str.fullmatch(NULL_TEXT_RE), "")
     return cleaned
 
 
-def read_excel_df(content: bytes, filename: str) -> pd.DataFrame:
-    if not filename.lower().endswith((".xlsx", ".xls")):
-        raise HTTPException(status_code=400, detail="El archivo debe ser Excel (.xlsx o .xls).")
+def read_excel_df(source: BinaryIO, filename: str) -> pd.DataFrame:
+    if not filename.lower().endswith((".xlsx", ".xls", ".xlsb")):
+        raise HTTPException(
+            status_code=400, detail="El archivo debe ser Excel (.xlsx, .xls o .xlsb)."
+        )
+    # calamine (Rust) es mucho mas rapido que openpyxl en libros grandes;
+    # openpyxl queda como respaldo solo para .xlsx, el unico formato que sabe leer.
+    try:
+        return pd.read_excel(source, engine="calamine")
+    except Exception as exc:  # noqa: BLE001
+        if not filename.lower().endswith(".xlsx"):
+            raise HTTPException(status_code=400, detail=f"No pude leer el Excel: {exc}") from exc
+        source.seek(0)
     try:
         with warnings.catch_warnings():
             warnings.filterwarnings(
@@ -185,12 +259,13 @@ def read_excel_df(content: bytes, filename: str) -> pd.DataFrame:
                 message="Workbook contains no default style, apply openpyxl's default",
                 category=UserWarning,
             )
-            return pd.read_excel(io.BytesIO(content))
+            return pd.read_excel(source, engine="openpyxl")
     except Exception as exc:  # noqa: BLE001
         raise HTTPException(status_code=400, detail=f"No pude leer el Excel: {exc}") from exc
 
 
 def detect_mapping(df: pd.DataFrame) -> dict[str, Any]:
+    norm_columns = normalized_columns(df)
     salesperson_col = find_column(
         df,
         [
@@ -202,6 +277,7 @@ def detect_mapping(df: pd.DataFrame) -> dict[str, Any]:
             "asesor",
             "gestor",
         ],
+        norm_columns,
     )
     client_col = find_column(
         df,
@@ -214,13 +290,15 @@ def detect_mapping(df: pd.DataFrame) -> dict[str, Any]:
             "empresa",
             "destinatario",
         ],
+        norm_columns,
     )
-    month_col = find_column(df, ["mes", "month"])
+    month_col = find_column(df, ["mes", "month"], norm_columns)
     revenue_col = find_column(
         df,
         ["facturacion bruta", "facturacion", "ventas", "importe", "total", "revenue"],
+        norm_columns,
     )
-    m_cols = month_columns(df)
+    m_cols = month_columns(df, norm_columns)
     structure = "long" if month_col and revenue_col else "wide" if m_cols else "unknown"
     return {
         "structure": structure,
@@ -257,8 +335,12 @@ def sanitize_mapping(mapping: dict[str, Any], available_columns: list[str]) -> d
     }
 
 
-def normalize_dataset(df: pd.DataFrame, mapping: dict[str, Any] | None = None) -> pd.DataFrame:
-    detected = detect_mapping(df)
+def normalize_dataset(
+    df: pd.DataFrame,
+    mapping: dict[str, Any] | None = None,
+    detected: dict[str, Any] | None = None,
+) -> pd.DataFrame:
+    detected = detected or detect_mapping(df)
     columns = df.columns.astype(str).tolist()
     user_mapping = sanitize_mapping(mapping or {}, columns)
 
@@ -300,8 +382,8 @@ def normalize_dataset(df: pd.DataFrame, mapping: dict[str, Any] | None = None) -
             {
                 "comercial": clean_text_series(df[salesperson_col].ffill()),
                 "cliente": clean_text_series(df[client_col]),
-                "mes": df[month_col].map(normalize_month_year),
-                "facturacion_bruta": df[revenue_col].map(parse_number),
+                "mes": map_unique_values(df[month_col], normalize_month_year),
+                "facturacion_bruta": parse_number_series(df[revenue_col]),
             }
         )
     else:
@@ -310,34 +392,49 @@ def normalize_dataset(df: pd.DataFrame, mapping: dict[str, Any] | None = None) -
                 status_code=400,
                 detail="Para formato wide debes seleccionar columnas de meses.",
             )
-        base = df[[salesperson_col, client_col]].copy()
-        normalized = pd.concat(
+        # ffill antes de pivotar para no arrastrar el comercial de un mes al siguiente.
+        # Las columnas id se renombran: el mapping puede repetir comercial/cliente entre
+        # las columnas de meses y seleccionarlas por su nombre original las duplicaria.
+        base = pd.concat(
             [
-                pd.DataFrame(
-                    {
-                        "comercial": clean_text_series(base[salesperson_col].ffill()),
-                        "cliente": clean_text_series(base[client_col]),
-                        "mes": normalize_month_year(col),
-                        "facturacion_bruta": df[col].map(parse_number),
-                    }
-                )
-                for col in m_cols
+                df[salesperson_col].ffill().rename("_comercial"),
+                df[client_col].rename("_cliente"),
+                df[list(m_cols)],
             ],
-            ignore_index=True,
+            axis=1,
+        )
+        long_df = base.melt(
+            id_vars=["_comercial", "_cliente"],
+            value_vars=list(m_cols),
+            var_name="mes_raw",
+            value_name="facturacion_raw",
+        )
+        normalized = pd.DataFrame(
+            {
+                "comercial": clean_text_series(long_df["_comercial"]),
+                "cliente": clean_text_series(long_df["_cliente"]),
+                "mes": map_unique_values(long_df["mes_raw"], normalize_month_year),
+                "facturacion_bruta": parse_number_series(long_df["facturacion_raw"]),
+            }
         )
 
-    normalized = normalized[normalized["comercial"] != ""]
-    normalized = normalized[normalized["cliente"] != ""]
-    normalized = normalized[normalized["mes"] != ""]
-    normalized = normalized[normalized["facturacion_bruta"] > 0]
+    mask = (
+        (normalized["comercial"] != "")
+        & (normalized["cliente"] != "")
+        & (normalized["mes"] != "")
+        & (normalized["facturacion_bruta"] > 0)
+    )
+    normalized = normalized.loc[mask].reset_index(drop=True)
+    # Ordenamos los meses una sola vez: las opciones de filtro salen de las categorias.
+    months = sorted(normalized["mes"].unique().tolist(), key=month_year_sort_key)
+    normalized["mes"] = pd.Categorical(normalized["mes"], categories=months, ordered=True)
     return normalized
 
 
 def rows_preview(df: pd.DataFrame, limit: int = 5) -> list[dict[str, str]]:
-    preview = df.head(limit).copy()
-    for col in preview.columns:
-        preview[col] = preview[col].map(lambda value: "" if pd.isna(value) else str(value))
-    return preview.to_dict(orient="records")
+    # Pasamos a object antes de rellenar: fillna("") no limpia los NaT de columnas de fecha.
+    preview = df.head(limit).astype(object)
+    return preview.where(preview.notna(), "").astype(str).to_dict(orient="records")
 
 
 def dataframe_columns(df: pd.DataFrame) -> list[str]:
@@ -347,7 +444,7 @@ def dataframe_columns(df: pd.DataFrame) -> list[str]:
 def build_filter_options(normalized: pd.DataFrame) -> dict[str, list[str]]:
     return {
         "comerciales": sorted(normalized["comercial"].dropna().unique().tolist()),
-        "meses": sorted(normalized["mes"].dropna().unique().tolist(), key=month_year_sort_key),
+        "meses": normalized["mes"].cat.categories.tolist(),
     }
 
 
@@ -355,8 +452,8 @@ def parse_json_filter_list(raw_json: str | None, field_name: str) -> list[str]:
     if not raw_json:
         return []
     try:
-        parsed = json.loads(raw_json)
-    except json.JSONDecodeError as exc:
+        parsed = orjson.loads(raw_json)
+    except orjson.JSONDecodeError as exc:
         raise HTTPException(status_code=400, detail=f"Filtro {field_name} invalido: {exc}") from exc
     if not isinstance(parsed, list):
         return []
@@ -364,10 +461,24 @@ def parse_json_filter_list(raw_json: str | None, field_name: str) -> list[str]:
 
 
 def get_saved_mapping() -> dict[str, Any] | None:
-    if not MAPPING_FILE.exists():
+    global _MAPPING_CACHE
+    try:
+        stat = MAPPING_FILE.stat()
+    except OSError:
         return None
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _MAPPING_CACHE
+    if cached is not None and cached[0] == key:
+        return copy.deepcopy(cached[1])
+    data = read_saved_mapping_file()
+    _MAPPING_CACHE = (key, data)
+    # Copia: el dict cacheado se comparte entre requests (y hilos).
+    return copy.deepcopy(data)
+
+
+def read_saved_mapping_file() -> dict[str, Any] | None:
     try:
-        data = json.loads(MAPPING_FILE.read_text(encoding="utf-8"))
+        data = orjson.loads(MAPPING_FILE.read_bytes())
         if isinstance(data, dict):
             return data
     except Exception:  # noqa: BLE001
@@ -375,12 +486,30 @@ def get_saved_mapping() -> dict[str, Any] | None:
     return None
 
 
+def write_saved_mapping(mapping: dict[str, Any]) -> None:
+    global _MAPPING_CACHE
+    # Escritura atomica: un lector concurrente ve el fichero anterior o el nuevo, nunca a medias.
+    fd, tmp_path = tempfile.mkstemp(dir=MAPPING_FILE.parent, prefix=f".{MAPPING_FILE.name}.")
+    try:
+        # json de la stdlib: acepta todo lo que FastAPI ha parseado (p.ej. enteros > 64 bits),
+        # y en esta escritura puntual orjson no aporta nada.
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp:
+            tmp.write(json.dumps(mapping, ensure_ascii=False, indent=2))
+        # mkstemp crea el fichero con 0600; os.replace conservaria ese modo.
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, MAPPING_FILE)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    _MAPPING_CACHE = None
+
+
 def parse_mapping_json(mapping_json: str | None) -> dict[str, Any] | None:
     if not mapping_json:
         return None
     try:
-        data = json.loads(mapping_json)
-    except json.JSONDecodeError as exc:
+        data = orjson.loads(mapping_json)
+    except orjson.JSONDecodeError as exc:
         raise HTTPException(status_code=400, detail=f"JSON de mapping invalido: {exc}") from exc
     if not isinstance(data, dict):
         raise HTTPException(status_code=400, detail="El mapping debe ser un objeto JSON.")
@@ -508,25 +637,28 @@ def mapping_get() -> dict[str, Any]:
 
 @app.post("/api/commissions/mapping/save")
 def mapping_save(mapping: dict[str, Any]) -> dict[str, Any]:
-    MAPPING_FILE.write_text(json.dumps(mapping, ensure_ascii=False, indent=2), encoding="utf-8")
+    write_saved_mapping(mapping)
     return {"saved": True}
 
 
+# Endpoints sincronos: FastAPI los ejecuta en su threadpool, asi la lectura del
+# Excel y la normalizacion no bloquean el event loop ni serializan subidas.
 @app.post("/api/commissions/inspect")
-async def inspect(
+def inspect(
     file: UploadFile = File(...),
     mapping_json: str | None = Form(None),
 ) -> dict[str, Any]:
     filename = file.filename or ""
-    content = await file.read()
-    df = read_excel_df(content, filename)
+    # UploadFile ya vuelca a disco los ficheros grandes: leemos de ahi sin copiarlo a memoria.
+    file.file.seek(0)
+    df = read_excel_df(file.file, filename)
     detected = detect_mapping(df)
     provided_mapping = parse_mapping_json(mapping_json)
     saved_mapping = get_saved_mapping()
     columns = dataframe_columns(df)
     effective_mapping = resolve_effective_mapping(df, detected, provided_mapping, saved_mapping)
 
-    normalized = normalize_dataset(df, mapping=effective_mapping)
+    normalized = normalize_dataset(df, mapping=effective_mapping, detected=detected)
     options = build_filter_options(normalized)
 
     return {
@@ -542,7 +674,7 @@ async def inspect(
 
 
 @app.post("/api/commissions/analyze")
-async def analyze(
+def analyze(
     file: UploadFile = File(...),
     commission_rate: float = Form(5.0),
     comercial: str | None = Form(None),
@@ -555,14 +687,15 @@ async def analyze(
         raise HTTPException(status_code=400, detail="La comision no puede ser negativa.")
 
     filename = file.filename or ""
-    content = await file.read()
-    df = read_excel_df(content, filename)
+    # UploadFile ya vuelca a disco los ficheros grandes: leemos de ahi sin copiarlo a memoria.
+    file.file.seek(0)
+    df = read_excel_df(file.file, filename)
     provided_mapping = parse_mapping_json(mapping_json)
     saved_mapping = get_saved_mapping()
     detected = detect_mapping(df)
     mapping = resolve_effective_mapping(df, detected, provided_mapping, saved_mapping)
 
-    normalized = normalize_dataset(df, mapping=mapping)
+    normalized = normalize_dataset(df, mapping=mapping, detected=detected)
     options = build_filter_options(normalized)
 
     comerciales = parse_json_filter_list(comerciales_json, "comerciales_json")
@@ -575,27 +708,26 @@ async def analyze(
 
     if comerciales:
         target_comerciales = {normalize_text(c) for c in comerciales}
-        normalized = normalized[normalized["comercial"].map(normalize_text).isin(target_comerciales)]
+        comercial_keys = map_unique_values(normalized["comercial"], normalize_text)
+        normalized = normalized[comercial_keys.isin(target_comerciales)]
     if meses:
         target_meses = {normalize_text(m) for m in meses}
-        normalized = normalized[normalized["mes"].map(normalize_text).isin(target_meses)]
+        mes_keys = map_unique_values(normalized["mes"], normalize_text)
+        normalized = normalized[mes_keys.isin(target_meses)]
 
-    normalized = normalized.copy()
-    normalized["comision_eur"] = normalized["facturacion_bruta"] * (commission_rate / 100.0)
+    normalized = normalized.assign(
+        comision_eur=normalized["facturacion_bruta"] * (commission_rate / 100.0)
+    )
     total_facturacion = round(float(normalized["facturacion_bruta"].sum()), 2)
     total_comision = round(float(normalized["comision_eur"].sum()), 2)
 
-    rows = []
-    for _, row in normalized.iterrows():
-        rows.append(
-            {
-                "comercial": row["comercial"],
-                "cliente": row["cliente"],
-                "mes": row["mes"],
-                "facturacion_bruta": round(float(row["facturacion_bruta"]), 2),
-                "comision_eur": round(float(row["comision_eur"]), 2),
-            }
-        )
+    # round() de Python por valor, como antes: Series.round(2) resuelve los empates al par
+    # y cambiaria algun centimo visible en la tabla.
+    for col in ("facturacion_bruta", "comision_eur"):
+        normalized[col] = [round(value, 2) for value in normalized[col].tolist()]
+    rows = normalized[["comercial", "cliente", "mes", "facturacion_bruta", "comision_eur"]].to_dict(
+        orient="records"
+    )
 
     return {
         "commission_rate": commission_rate,
@@ -548,9 +548,9 @@ export default function App() {
             <div className="upload-box">
               <div className="upload-meta">
                 <strong>{file ? file.name : "Ningun archivo seleccionado"}</strong>
-                <span>Formatos: .xlsx, .xls</span>
+                <span>Formatos: .xlsx, .xls, .xlsb</span>
               </div>
-              <input ref={fileInputRef} type="file" accept=".xlsx,.xls" className="hidden-file-input" onChange={(e) => resetForNewFile(e.target.files?.[0] || null)} />
+              <input ref={fileInputRef} type="file" accept=".xlsx,.xls,.xlsb" className="hidden-file-input" onChange={(e) => resetForNewFile(e.target.files?.[0] || null)} />
               <button type="button" className="secondary" onClick={pickFile}>
                 Elegir archivo
               </button>